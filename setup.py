@@ -34,6 +34,7 @@ REQUIRED = [
     "tqdm",
     "similaritymeasures",
     "pygeos>=0.10.0",
+    "numba",
 ]
 
 install_requires = [
@@ -50,6 +51,7 @@ install_requires = [
     "geopandas>=0.10.0",
     "similaritymeasures",
     "pygeos>=0.10.0",
+    "numba",
 ]
 
 # What packages are optional?
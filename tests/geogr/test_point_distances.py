@@ -70,3 +70,17 @@ class TestHaversineDist:
         d_ours = haversine_dist(bsas[1], bsas[0], paris[1], paris[0])
 
         assert np.abs(d_theirs[1][0] - d_ours) < 0.01
+
+    def test_small_distances(self):
+        """Distances of a few centimeters are not rounded to 0."""
+        # 1e-7 degrees of latitude are about 1.1cm
+        d_ours = haversine_dist(8.5, 47.3, 8.5, 47.3 + 1e-7)
+        d_scalar = haversine_dist(8.5, 47.3, 8.5, 47.3 + 1e-7, float_flag=True)
+
+        assert np.isclose(d_ours, 6371000 * radians(1e-7))
+        assert np.isclose(d_scalar, 6371000 * radians(1e-7))
+
+    def test_same_point(self):
+        """The distance of a point to itself is 0."""
+        assert haversine_dist(8.5, 47.3, 8.5, 47.3) == 0
+        assert haversine_dist(8.5, 47.3, 8.5, 47.3, float_flag=True) == 0
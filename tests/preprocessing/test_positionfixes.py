@@ -11,6 +11,8 @@ from geopandas.testing import assert_geodataframe_equal
 from shapely.geometry import Point
 
 import trackintel as ti
+from trackintel.geogr.point_distances import haversine_dist
+from trackintel.preprocessing.positionfixes import _generate_staypoints_sliding, _sliding_segments_nb
 
 
 @pytest.fixture
@@ -109,6 +111,23 @@ class TestGenerate_staypoints:
         assert_geodataframe_equal(pfs_ori, pfs_para)
         assert_geodataframe_equal(sp_ori, sp_para)
 
+    def test_parallel_batches(self):
+        """Processing batches of users in parallel threads should give the serial result."""
+        pfs, _ = ti.io.dataset_reader.read_geolife(os.path.join("tests", "data", "geolife_long"))
+        # more users than threads and batches
+        pfs = pd.concat([pfs.assign(user_id=pfs["user_id"] + 10 * i) for i in range(8)], ignore_index=True)
+        pfs.index.name = "id"
+        pfs_ori, sp_ori = pfs.as_positionfixes.generate_staypoints(n_jobs=1, include_last=True)
+        for kwargs in [{"n_jobs": -1}, {"n_jobs": 3}, {"n_jobs": 2, "print_progress": True}]:
+            pfs_para, sp_para = pfs.as_positionfixes.generate_staypoints(include_last=True, **kwargs)
+            assert_geodataframe_equal(pfs_ori, pfs_para)
+            assert_geodataframe_equal(sp_ori, sp_para)
+
+    def test_n_jobs_zero(self, example_positionfixes):
+        """n_jobs=0 has no meaning and should raise a ValueError."""
+        with pytest.raises(ValueError, match="n_jobs == 0 has no meaning"):
+            example_positionfixes.as_positionfixes.generate_staypoints(n_jobs=0)
+
     def test_duplicate_pfs_warning(self, example_positionfixes):
         """Calling generate_staypoints with duplicate positionfixes should raise a warning."""
         pfs_duplicate_loc = example_positionfixes.copy()
@@ -303,8 +322,8 @@ class TestGenerate_staypoints:
             pfs, sp = pfs.as_positionfixes.generate_staypoints()
 
 
-class Test_Generate_staypoints_sliding_user:
-    """Test for _generate_staypoints_sliding_user."""
+class Test_Generate_staypoints_sliding:
+    """Test for _generate_staypoints_sliding."""
 
     def test_unknown_distance_metric(self, example_positionfixes):
         """Test if the distance metric is unknown, an AttributeError will be raised."""
@@ -313,9 +332,47 @@ class Test_Generate_staypoints_sliding_user:
                 method="sliding", dist_threshold=100, time_threshold=5, distance_metric="unknown"
             )
 
+    def test_empty_pfs(self, example_positionfixes):
+        """Empty positionfixes generate no staypoints, also if the last staypoint is included."""
+        pfs = example_positionfixes.iloc[:0]
+        for include_last in [False, True]:
+            sp = _generate_staypoints_sliding(
+                pfs,
+                geo_col="geometry",
+                elevation_flag=False,
+                dist_threshold=100,
+                time_threshold=5.0,
+                gap_threshold=15.0,
+                distance_metric="haversine",
+                include_last=include_last,
+            )
+            assert len(sp) == 0
 
-class Test__create_new_staypoints:
-    """Test __create_new_staypoints."""
+    def test_empty_kernel(self):
+        """The kernel returns no segments for a user without positionfixes."""
+        empty = np.empty(0)
+        for kernel in [_sliding_segments_nb, _sliding_segments_nb.py_func]:
+            starts, ends = kernel(empty, empty, empty.astype("int64"), 100.0, 0, 10, True)
+            assert len(starts) == len(ends) == 0
+
+    @pytest.mark.parametrize(
+        "lon, lat",
+        [
+            ([8.5, 8.5], [47.4, 47.401]),  # along the meridian
+            ([8.5, 8.501], [47.4, 47.401]),  # diagonal -> the upper bound of the prefilter is loose
+            ([179.9995, -179.9995], [0.0, 0.0]),  # across the antimeridian
+            ([0.0, 90.0], [89.999, 89.999]),  # high latitude -> large difference in longitude
+        ],
+    )
+    def test_kernel_dist_threshold(self, lon, lat):
+        """The kernel splits two positionfixes iff their distance is at least dist_threshold."""
+        dist = haversine_dist(lon[0], lat[0], lon[1], lat[1])[0]
+        lon, lat = np.radians(lon), np.radians(lat)
+        tracked_at = np.array([0, 1])
+        for kernel in [_sliding_segments_nb, _sliding_segments_nb.py_func]:
+            for dist_threshold, is_split in [(dist * (1 - 1e-6), True), (dist * (1 + 1e-6), False)]:
+                starts, _ = kernel(lon, lat, tracked_at, dist_threshold, 0, 10, False)
+                assert (len(starts) == 1) == is_split
 
     def test_planar_crs(self, geolife_pfs_sp_long):
         """Test if planar crs are handled as well"""
@@ -554,3 +611,80 @@ class TestGenerate_triplegs:
         # set user ID to string
         pfs["user_id"] = pfs["user_id"].astype(str)
         pfs, tpls = pfs.as_positionfixes.generate_triplegs()
+
+    def test_str_userid_tpls(self, example_positionfixes_isolated):
+        """The user IDs of the triplegs are the string user IDs of their positionfixes."""
+        pfs = example_positionfixes_isolated
+        pfs["user_id"] = pfs["user_id"].astype(str)
+        # user 0 and 2 have no valid tripleg
+        with pytest.warns(UserWarning):
+            pfs, tpls = pfs.as_positionfixes.generate_triplegs()
+        assert tpls["user_id"].tolist() == ["1"]
+        assert tpls["user_id"].dtype == pfs["user_id"].dtype
+
+    def test_all_pfs_in_sp(self, example_positionfixes_isolated):
+        """No tripleg is generated if all positionfixes belong to a staypoint."""
+        pfs = example_positionfixes_isolated
+        pfs["staypoint_id"] = np.arange(len(pfs))
+
+        warn_string = "No triplegs can be generated, returning empty tpls."
+        with pytest.warns(UserWarning, match=warn_string):
+            pfs, tpls = pfs.as_positionfixes.generate_triplegs()
+        assert len(tpls) == 0
+        assert pfs["tripleg_id"].isna().all()
+
+    def test_case2_short_run(self, example_positionfixes_isolated):
+        """Positionfixes between staypoints that cannot form a linestring do not generate triplegs (case 2)."""
+        pfs = example_positionfixes_isolated
+        # user 2 has a single positionfix between two staypoints
+        pfs = pfs.loc[pfs["user_id"] == 2]
+        sp = self._staypoints_of(pfs)
+        pfs = pfs.drop(columns="staypoint_id")
+
+        warn_string = "No triplegs can be generated, returning empty tpls."
+        with pytest.warns(UserWarning, match=warn_string):
+            pfs, tpls = pfs.as_positionfixes.generate_triplegs(sp)
+        assert len(tpls) == 0
+        assert pfs["tripleg_id"].isna().all()
+
+    def test_case2_overlapping_sp(self, example_positionfixes_isolated):
+        """Positionfixes within a staypoint that contains another staypoint do not start a tripleg (case 2)."""
+        pfs = example_positionfixes_isolated
+        pfs = pfs.loc[pfs["user_id"] == 1].drop(columns="staypoint_id")
+        t = pfs["tracked_at"]
+        # the second staypoint lies within the first one, the pfs at t.iloc[2] belongs to the first one
+        sp = gpd.GeoDataFrame(
+            {
+                "user_id": 1,
+                "started_at": [t.iloc[0], t.iloc[1]],
+                "finished_at": [t.iloc[2] + pd.Timedelta("1s"), t.iloc[1] + pd.Timedelta("1s")],
+                "geometry": pfs.geometry.iloc[:2].values,
+            },
+            geometry="geometry",
+            crs=pfs.crs,
+        )
+        # add a pfs after the first staypoint such that a tripleg can be generated
+        pfs.loc[8] = [1, t.iloc[3] + pd.Timedelta("1min"), Point(8.5067847, 47.7)]
+
+        pfs, tpls = pfs.as_positionfixes.generate_triplegs(sp)
+        assert len(tpls) == 1
+        assert tpls["started_at"].iloc[0] == t.iloc[3]
+        assert pfs["tripleg_id"].tolist() == [pd.NA, pd.NA, pd.NA, 0, 0]
+
+    def _staypoints_of(self, pfs):
+        """Staypoints that contain the positionfixes with a 'staypoint_id'."""
+        pfs = pfs[pfs["staypoint_id"].notna()]
+        sp = gpd.GeoDataFrame(
+            {
+                "user_id": pfs["user_id"].values,
+                "started_at": pfs["tracked_at"].values,
+                "finished_at": (pfs["tracked_at"] + pd.Timedelta("1s")).values,
+                "geometry": pfs.geometry.values,
+            },
+            index=pfs["staypoint_id"].values,
+            geometry="geometry",
+            crs=pfs.crs,
+        )
+        sp["started_at"] = sp["started_at"].dt.tz_localize("utc")
+        sp["finished_at"] = sp["finished_at"].dt.tz_localize("utc")
+        return sp
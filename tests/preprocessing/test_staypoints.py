@@ -152,6 +152,23 @@ class TestGenerate_locations:
         assert_geodataframe_equal(locs_ori, locs_para)
         assert_geodataframe_equal(sp_ori, sp_para)
 
+    def test_parallel_computing_dataset(self, example_staypoints):
+        """The result obtained with parallel computing should be identical on the dataset level."""
+        sp = example_staypoints
+
+        # without parallel computing code
+        sp_ori, locs_ori = sp.as_staypoints.generate_locations(
+            method="dbscan", epsilon=10, num_samples=2, distance_metric="haversine", agg_level="dataset", n_jobs=1
+        )
+        # using two cores
+        sp_para, locs_para = sp.as_staypoints.generate_locations(
+            method="dbscan", epsilon=10, num_samples=2, distance_metric="haversine", agg_level="dataset", n_jobs=2
+        )
+
+        # the result of parallel computing should be identical
+        assert_geodataframe_equal(locs_ori, locs_para)
+        assert_geodataframe_equal(sp_ori, sp_para)
+
     def test_dbscan_hav_euc(self):
         """Test if using haversine and euclidean distances will generate the same location result."""
         sp_file = os.path.join("tests", "data", "geolife", "geolife_staypoints.csv")
@@ -190,6 +207,25 @@ class TestGenerate_locations:
 
         assert len(set(locs.index)) == len(set(labels))
 
+    def test_dbscan_haversine_lat_lon(self):
+        """Test that the haversine distance of DBSCAN is computed on latitude and longitude."""
+        # the staypoints are about 83m apart, with swapped coordinates their distance would be about 167m
+        t1 = pd.Timestamp("1971-01-01 00:00:00", tz="utc")
+        t2 = pd.Timestamp("1971-01-01 05:00:00", tz="utc")
+        list_dict = [
+            {"user_id": 0, "started_at": t1, "finished_at": t2, "geom": Point(8.5, 60)},
+            {"user_id": 0, "started_at": t2, "finished_at": t2, "geom": Point(8.5015, 60)},
+        ]
+        sp = gpd.GeoDataFrame(data=list_dict, geometry="geom", crs="EPSG:4326")
+        sp.index.name = "id"
+
+        for agg_level in ["user", "dataset"]:
+            sp_loc, locs = sp.as_staypoints.generate_locations(
+                method="dbscan", epsilon=100, num_samples=1, distance_metric="haversine", agg_level=agg_level
+            )
+            assert len(locs) == 1
+            assert (sp_loc["location_id"] == 0).all()
+
     def test_dbscan_loc(self):
         """Test haversine dbscan location result with manually grouping the locations method."""
         sp_file = os.path.join("tests", "data", "geolife", "geolife_staypoints.csv")
@@ -1,13 +1,19 @@
 import datetime
 
 import geopandas as gpd
+import numpy as np
 from geopandas.testing import assert_geoseries_equal
 import pandas as pd
 import pytest
 from pandas.testing import assert_frame_equal
 from shapely.geometry import MultiPoint, Point
 
-from trackintel.preprocessing.util import _explode_agg, calc_temp_overlap, angle_centroid_multipoints
+from trackintel.preprocessing.util import (
+    _angle_centroid_coordinates,
+    _explode_agg,
+    angle_centroid_multipoints,
+    calc_temp_overlap,
+)
 
 
 @pytest.fixture
@@ -106,3 +112,20 @@ class TestAngleCentroidMultipoints:
     g_solution = gpd.GeoSeries([a, Point([175, 15]), Point([30, 10]), Point(0, 0), Point(-90, 0)])
     g = gpd.GeoSeries(angle_centroid_multipoints(g))
     assert_geoseries_equal(g, g_solution, check_less_precise=True)
+
+
+class TestAngleCentroidCoordinates:
+    """Test util method _angle_centroid_coordinates"""
+
+    def test_groups(self):
+        """Coordinates are averaged per group, with wrapping of the x coordinate."""
+        coords = np.array([[160, 10], [20, 0], [-170, 20], [40, 20]])
+        index = np.array([0, 1, 0, 1])
+        x, y = _angle_centroid_coordinates(coords, index)
+        assert np.allclose(x, [175, 30])
+        assert np.allclose(y, [15, 10])
+
+    def test_empty(self):
+        """Empty coordinates lead to empty means."""
+        x, y = _angle_centroid_coordinates(np.empty((0, 2)), np.empty(0, dtype=int), minlength=0)
+        assert len(x) == len(y) == 0
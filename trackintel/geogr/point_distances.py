@@ -50,21 +50,20 @@ def haversine_dist(lon_1, lat_1, lon_2, lat_2, r=6371000, float_flag=False):
         lon_2 = math.radians(lon_2)
         lat_2 = math.radians(lat_2)
 
-        cos_lat2 = math.cos(lat_2)
-        cos_lat1 = math.cos(lat_1)
-        cos_lat_d = math.cos(lat_1 - lat_2)
-        cos_lon_d = math.cos(lon_1 - lon_2)
+        sin_lat_d = math.sin((lat_2 - lat_1) * 0.5)
+        sin_lon_d = math.sin((lon_2 - lon_1) * 0.5)
+        a = sin_lat_d * sin_lat_d + math.cos(lat_1) * math.cos(lat_2) * sin_lon_d * sin_lon_d
 
-        return r * math.acos(cos_lat_d - cos_lat1 * cos_lat2 * (1 - cos_lon_d))
+        return 2 * r * math.asin(math.sqrt(min(a, 1.0)))
 
     lon_1 = np.deg2rad(lon_1).ravel()
     lat_1 = np.deg2rad(lat_1).ravel()
     lon_2 = np.deg2rad(lon_2).ravel()
     lat_2 = np.deg2rad(lat_2).ravel()
 
-    cos_lat1 = np.cos(lat_1)
-    cos_lat2 = np.cos(lat_2)
-    cos_lat_d = np.cos(lat_1 - lat_2)
-    cos_lon_d = np.cos(lon_1 - lon_2)
+    # the haversine formulation (arcsin) is numerically stable for small distances, contrary to arccos
+    sin_lat_d = np.sin((lat_2 - lat_1) * 0.5)
+    sin_lon_d = np.sin((lon_2 - lon_1) * 0.5)
+    a = sin_lat_d**2 + np.cos(lat_1) * np.cos(lat_2) * sin_lon_d**2
 
-    return r * np.arccos(cos_lat_d - cos_lat1 * cos_lat2 * (1 - cos_lon_d))
+    return 2 * r * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
@@ -1,14 +1,18 @@
 import datetime
+import math
+import os
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 
 import geopandas as gpd
 import numpy as np
 import pandas as pd
+import pygeos
+from numba import njit
 from tqdm import tqdm
-from shapely.geometry import LineString
 
-from trackintel.geogr.distances import check_gdf_planar, haversine_dist
-from trackintel.preprocessing.util import _explode_agg, angle_centroid_multipoints, applyParallel
+from trackintel.geogr.distances import check_gdf_planar
+from trackintel.preprocessing.util import _angle_centroid_coordinates
 
 
 def generate_staypoints(
@@ -63,10 +67,9 @@ def generate_staypoints(
         processing steps (e.g., when generating triplegs). It is not recommended to set this to False.
 
     n_jobs: int, default 1
-        The maximum number of concurrently running jobs. If -1 all CPUs are used. If 1 is given, no parallel
-        computing code is used at all, which is useful for debugging. See
-        https://joblib.readthedocs.io/en/latest/parallel.html#parallel-reference-documentation
-        for a detailed description
+        The maximum number of threads used to process the users in parallel. If -1 all CPUs are used, if -2 all
+        but one, and so on. If 1 is given, the users are processed one after the other, which is useful for
+        debugging. 0 raises a ValueError.
 
     Returns
     -------
@@ -126,11 +129,8 @@ def generate_staypoints(
     # TODO: tests using a different distance function, e.g., L2 distance
     if method == "sliding":
         # Algorithm from Li et al. (2008). For details, please refer to the paper.
-        sp = applyParallel(
-            pfs.groupby("user_id", as_index=False),
-            _generate_staypoints_sliding_user,
-            n_jobs=n_jobs,
-            print_progress=print_progress,
+        sp = _generate_staypoints_sliding(
+            pfs,
             geo_col=geo_col,
             elevation_flag=elevation_flag,
             dist_threshold=dist_threshold,
@@ -138,15 +138,20 @@ def generate_staypoints(
             gap_threshold=gap_threshold,
             distance_metric=distance_metric,
             include_last=include_last,
-        ).reset_index(drop=True)
+            print_progress=print_progress,
+            n_jobs=n_jobs,
+        )
 
         # index management
-        sp["staypoint_id"] = sp.index
         sp.index.name = "id"
 
-        if "pfs_id" not in sp.columns:
-            sp["pfs_id"] = None
-        pfs = _explode_agg("pfs_id", "staypoint_id", pfs, sp)
+        # link the pfs to their staypoint with two flat arrays of pfs ids and staypoint ids
+        pfs_id = sp["pfs_id"].to_list()
+        nb_pfs = np.fromiter(map(len, pfs_id), dtype=np.int64, count=len(pfs_id))
+        pfs_id = np.concatenate(pfs_id) if len(pfs_id) > 0 else pfs.index[:0]
+        # pfs['staypoint_id'] should be Int64 (missing values)
+        staypoint_id = pd.Series(np.repeat(sp.index.to_numpy(), nb_pfs), index=pfs_id, dtype="Int64")
+        pfs["staypoint_id"] = staypoint_id.reindex(pfs.index)
     sp = gpd.GeoDataFrame(sp, columns=sp_column, geometry=geo_col, crs=pfs.crs)
 
     if len(sp) > 0:
@@ -155,13 +160,10 @@ def generate_staypoints(
         warnings.warn("No staypoints can be generated, returning empty sp.")
 
     ## dtype consistency
-    # sp id (generated by this function) should be int64
-    sp.index = sp.index.astype("int64")
-    # ret_pfs['staypoint_id'] should be Int64 (missing values)
-    pfs["staypoint_id"] = pfs["staypoint_id"].astype("Int64")
-
-    # user_id of sp should be the same as ret_pfs
-    sp["user_id"] = sp["user_id"].astype(pfs["user_id"].dtype)
+    # sp id (generated by this function) should be int64, user_id of sp should be the same as pfs
+    # cast in one pass without copying columns that have the right dtype already
+    sp.index = sp.index.astype("int64", copy=False)
+    sp = sp.astype({"user_id": pfs["user_id"].dtype}, copy=False)
 
     return pfs, sp
 
@@ -246,41 +248,45 @@ def generate_triplegs(
         # - step 2: Find first positionfix after a staypoint
         # (relevant if the pfs of sp are not provided, and we can only infer the pfs after sp through time)
         if case == 2:
-            # initialize the index list of pfs where a tpl will begin
-            insert_index_ls = []
+            # initialize the list of positions of pfs where a tpl will begin
+            insert_position_ls = []
             pfs["staypoint_id"] = pd.NA
+            is_in_sp = np.zeros(len(pfs), dtype=bool)
 
             # initalize the variable 'disable' to control display of progress bar.
             disable = not print_progress
 
-            for user_id_this in tqdm(pfs["user_id"].unique(), disable=disable):
-                sp_user = staypoints[staypoints["user_id"] == user_id_this]
-                pfs_user = pfs[pfs["user_id"] == user_id_this]
+            # pfs are sorted by user and time, each user is a contiguous slice already sorted by 'tracked_at'
+            user_starts = np.flatnonzero(pfs["user_id"] != pfs["user_id"].shift(1))
+            user_ends = np.append(user_starts[1:], len(pfs))
+
+            for start, end in tqdm(zip(user_starts, user_ends), total=len(user_starts), disable=disable):
+                sp_user = staypoints[staypoints["user_id"] == pfs["user_id"].iat[start]]
+                tracked_at_user = pfs["tracked_at"].iloc[start:end]
 
                 # step 1
                 # All positionfixes with timestamp between staypoints are assigned the value 0
-                # Intersect all positionfixes of a user with all staypoints of the same user
-                intervals = pd.IntervalIndex.from_arrays(sp_user["started_at"], sp_user["finished_at"], closed="left")
-                is_in_interval = pfs_user["tracked_at"].apply(lambda x: intervals.contains(x).any()).astype("bool")
-                pfs.loc[is_in_interval[is_in_interval].index, "staypoint_id"] = 0
+                # A positionfix is within [started_at, finished_at) of a staypoint if it is tracked before the
+                # latest 'finished_at' of all staypoints that started at or before it
+                sp_user = sp_user.sort_values("started_at")
+                nb_started = sp_user["started_at"].searchsorted(tracked_at_user, side="right")
+                latest_finished = np.append(np.datetime64("NaT"), sp_user["finished_at"].cummax().values)
+                is_in_sp[start:end] = tracked_at_user.values < latest_finished[nb_started]
 
                 # step 2
                 # Identify first positionfix after a staypoint
-                # find index of closest positionfix with equal or greater timestamp.
-                tracked_at_sorted = pfs_user["tracked_at"].sort_values()
-                insert_position_user = tracked_at_sorted.searchsorted(sp_user["finished_at"])
-                insert_index_user = tracked_at_sorted.iloc[insert_position_user].index
-
-                # store the insert insert_position_user in an array
-                insert_index_ls.extend(list(insert_index_user))
-            #
-            cond_staypoints_case2 = pd.Series(False, index=pfs.index)
-            cond_staypoints_case2.loc[insert_index_ls] = True
+                # find position of closest positionfix with equal or greater timestamp.
+                insert_position_user = tracked_at_user.searchsorted(sp_user["finished_at"])
+                # staypoints that finish after the last positionfix of the user do not start a tripleg
+                insert_position_user = insert_position_user[insert_position_user < end - start]
 
-        # initialize tripleg_id with pd.NA and fill all pfs that belong to staypoints with -1
-        # pd.NA will be replaced later with tripleg ids
-        pfs["tripleg_id"] = pd.NA
-        pfs.loc[~pd.isna(pfs["staypoint_id"]), "tripleg_id"] = -1
+                # store the insert positions relative to all pfs
+                insert_position_ls.append(insert_position_user + start)
+            pfs.loc[is_in_sp, "staypoint_id"] = 0
+
+            cond_staypoints_case2 = pd.Series(False, index=pfs.index)
+            if insert_position_ls:
+                cond_staypoints_case2.iloc[np.concatenate(insert_position_ls)] = True
 
         # get all conditions that trigger a new tripleg.
         # condition 1: a positionfix belongs to a new tripleg if the user changes. For this we need to sort pfs.
@@ -307,68 +313,40 @@ def generate_triplegs(
         # make sure not to create triplegs within staypoints:
         cond_all = cond_all & pd.isna(pfs["staypoint_id"])
 
-        # get the start position of tpls
-        tpls_starts = np.where(cond_all)[0]
-        tpls_diff = np.diff(tpls_starts)
-
-        # get the start position of staypoint
-        # pd.NA causes error in boolean comparision, replace to -1
-        sp_id = pfs["staypoint_id"].copy().fillna(-1)
-        unique_sp, sp_starts = np.unique(sp_id, return_index=True)
-        # get the index of where the tpls_starts belong in sp_starts
-        sp_starts = sp_starts[unique_sp != -1]
-        tpls_place_in_sp = np.searchsorted(sp_starts, tpls_starts)
-
-        # get the length between each stp and tpl
-        try:
-            # pfs ends with stp
-            sp_tpls_diff = sp_starts[tpls_place_in_sp] - tpls_starts
-
-            # tpls_lengths is the minimum of tpls_diff and sp_tpls_diff
-            # sp_tpls_diff one larger than tpls_diff
-            tpls_lengths = np.minimum(tpls_diff, sp_tpls_diff[:-1])
-
-            # the last tpl has length (last stp begin - last tpl begin)
-            tpls_lengths = np.append(tpls_lengths, sp_tpls_diff[-1])
-        except IndexError:
-            # pfs ends with tpl
-            # ignore the tpls after the last sp sp_tpls_diff
-            ignore_index = tpls_place_in_sp == len(sp_starts)
-            sp_tpls_diff = sp_starts[tpls_place_in_sp[~ignore_index]] - tpls_starts[~ignore_index]
-
-            # tpls_lengths is the minimum of tpls_diff and sp_tpls_diff
-            tpls_lengths = np.minimum(tpls_diff[: len(sp_tpls_diff)], sp_tpls_diff)
-            tpls_lengths = np.append(tpls_lengths, tpls_diff[len(sp_tpls_diff) :])
-
-            # add the length of the last tpl
-            tpls_lengths = np.append(tpls_lengths, len(pfs) - tpls_starts[-1])
+        # run-length encoding of the triplegs: every pf that does not belong to a staypoint is part of the run
+        # started by the last tripleg start (the first pf after a staypoint always starts a new run)
+        tpl_pos = np.flatnonzero(pd.isna(pfs["staypoint_id"]).to_numpy())
+        run_of_pos = np.cumsum(cond_all.to_numpy(dtype=bool))[tpl_pos] - 1
+        run_lengths = np.bincount(run_of_pos, minlength=cond_all.sum())
 
         # a valid linestring needs 2 points
-        cond_to_remove = np.take(tpls_starts, np.where(tpls_lengths < 2)[0])
-        cond_all.iloc[cond_to_remove] = False
-        # Note: cond_to_remove is the array index of pfs.index and not pfs.index itself
-        pfs.loc[pfs.index[cond_to_remove], "tripleg_id"] = -1
-
-        # assign an incrementing id to all positionfixes that start a tripleg
-        # create triplegs
-        pfs.loc[cond_all, "tripleg_id"] = np.arange(cond_all.sum())
-
-        # fill the pd.NAs with the previously observed tripleg_id
-        # pfs not belonging to tripleg are also propagated (with -1)
-        pfs["tripleg_id"] = pfs["tripleg_id"].fillna(method="ffill")
-        # assign back pd.NA to -1
-        pfs.loc[pfs["tripleg_id"] == -1, "tripleg_id"] = pd.NA
-
-        posfix_grouper = pfs.groupby("tripleg_id")
-
-        tpls = posfix_grouper.agg(
-            {"user_id": ["mean"], "tracked_at": [min, max], pfs.geometry.name: list}
-        )  # could add a "number of pfs": can be any column "count"
-
-        # prepare dataframe: Rename columns; read/set geometry/crs;
-        # Order of column has to correspond to the order of the groupby statement
-        tpls.columns = ["user_id", "started_at", "finished_at", "geom"]
-        tpls["geom"] = tpls["geom"].apply(LineString)
+        is_valid_run = run_lengths >= 2
+        keep = is_valid_run[run_of_pos]
+
+        # assign an incrementing id to the valid runs, all other pfs get pd.NA
+        tripleg_id = np.full(len(pfs), -1)
+        tripleg_id[tpl_pos[keep]] = (np.cumsum(is_valid_run) - 1)[run_of_pos[keep]]
+        pfs["tripleg_id"] = pd.arrays.IntegerArray(tripleg_id, mask=tripleg_id == -1)
+
+        # the pfs of a tripleg are consecutive and sorted by time -> its first and last pfs define user and times
+        tpl_pfs_pos = tpl_pos[keep]
+        tpl_lengths = run_lengths[is_valid_run]
+        tpl_ends = np.cumsum(tpl_lengths)
+        first, last = tpl_pfs_pos[tpl_ends - tpl_lengths], tpl_pfs_pos[tpl_ends - 1]
+        tpls = pd.DataFrame(
+            {
+                "user_id": pfs["user_id"].array[first],
+                "started_at": pfs["tracked_at"].array[first],
+                "finished_at": pfs["tracked_at"].array[last],
+            }
+        )
+
+        # create all linestrings at once from one coordinate array
+        xy = np.column_stack((pfs.geometry.x.to_numpy(), pfs.geometry.y.to_numpy()))[tpl_pfs_pos]
+        tpl_nr = np.repeat(np.arange(len(tpls)), tpl_lengths)
+        lines = pygeos.linestrings(xy, indices=tpl_nr)
+        # pass the lines as WKB, geopandas might not use pygeos as geometry backend
+        tpls["geom"] = gpd.GeoSeries.from_wkb(pygeos.to_wkb(lines), index=tpls.index)
         tpls = tpls.set_geometry("geom")
         tpls.crs = pfs.crs
 
@@ -397,78 +375,252 @@ def generate_triplegs(
         raise AttributeError(f"Method unknown. We only support 'between_staypoints'. You passed {method}")
 
 
-def _generate_staypoints_sliding_user(
-    df, geo_col, elevation_flag, dist_threshold, time_threshold, gap_threshold, distance_metric, include_last=False
+def _generate_staypoints_sliding(
+    pfs,
+    geo_col,
+    elevation_flag,
+    dist_threshold,
+    time_threshold,
+    gap_threshold,
+    distance_metric,
+    include_last=False,
+    print_progress=False,
+    n_jobs=1,
 ):
-    """User level staypoint generation using sliding method, see generate_staypoints() function for parameter meaning."""
-    if distance_metric == "haversine":
-        dist_func = haversine_dist
-    else:
+    """Staypoint generation using sliding method, see generate_staypoints() function for parameter meaning."""
+    if distance_metric != "haversine":
         raise AttributeError("distance_metric unknown. We only support ['haversine']. " f"You passed {distance_metric}")
 
-    df = df.sort_index(kind="stable").sort_values(by=["tracked_at"], kind="stable")
+    # sort once instead of per user, positionfixes with the same time keep the order of their index
+    df = pfs.sort_index(kind="stable").sort_values(by=["user_id", "tracked_at"], kind="stable")
 
     # transform times to pandas Timedelta to simplify comparisons
     gap_threshold = pd.Timedelta(gap_threshold, unit="minutes")
     time_threshold = pd.Timedelta(time_threshold, unit="minutes")
-    # to numpy as access time of numpy array is faster than pandas Series
-    gap_times = ((df.tracked_at - df.tracked_at.shift(1)) > gap_threshold).to_numpy()
 
-    # put x and y into numpy arrays to speed up the access in the for loop (shapely is slow)
+    # the compiled kernel works on plain arrays: coordinates in radians and times in int64 nanoseconds
     x = df[geo_col].x.to_numpy()
     y = df[geo_col].y.to_numpy()
+    lon = np.radians(x)
+    lat = np.radians(y)
+    tracked_at = df["tracked_at"].values.astype("datetime64[ns]").astype("int64")
+
+    starts, ends, finished = _sliding_segments(
+        lon,
+        lat,
+        tracked_at,
+        df["user_id"].to_numpy(),
+        float(dist_threshold),
+        time_threshold.value,
+        gap_threshold.value,
+        include_last,
+        print_progress,
+        n_jobs,
+    )
+
+    # Here we consider pfs[end] time for stp 'finished_at', but only include
+    # pfs[end - 1] for stp geometry and pfs linkage.
+    ret_sp = pd.DataFrame(
+        {
+            "started_at": df["tracked_at"].array[starts],
+            "finished_at": df["tracked_at"].array[finished],
+        }
+    )
+
+    # positions of the pfs aggregated into staypoints and the number of the staypoint they belong to
+    lengths = ends - starts
+    sp_nr = np.repeat(np.arange(len(starts)), lengths)
+    pos = np.arange(len(sp_nr)) - np.repeat(np.cumsum(lengths) - lengths - starts, lengths)
+
+    # the geometry is the centroid of the distinct locations of each staypoint
+    coords = pd.DataFrame({"sp_nr": sp_nr, "x": x[pos], "y": y[pos]}).drop_duplicates()
+    coords_nr = coords["sp_nr"].to_numpy()
+    coords_xy = coords[["x", "y"]].to_numpy()
+    if check_gdf_planar(df):
+        count = np.bincount(coords_nr, minlength=len(starts))
+        x_mean = np.bincount(coords_nr, weights=coords_xy[:, 0], minlength=len(starts)) / count
+        y_mean = np.bincount(coords_nr, weights=coords_xy[:, 1], minlength=len(starts)) / count
+    else:
+        # error of wrapping e.g. mean([-180, +180]) -> average the angles
+        x_mean, y_mean = _angle_centroid_coordinates(coords_xy, coords_nr, minlength=len(starts))
+    ret_sp[geo_col] = gpd.points_from_xy(x_mean, y_mean)
+
+    if elevation_flag:
+        ret_sp["elevation"] = pd.Series(df["elevation"].to_numpy()[pos]).groupby(sp_nr).median()
+    pfs_idx = df.index.to_numpy()
+    ret_sp["pfs_id"] = [pfs_idx[start:end] for start, end in zip(starts, ends)]
+
+    ret_sp["user_id"] = df["user_id"].array[starts]
+    return ret_sp
+
+
+def _sliding_segments(
+    lon, lat, tracked_at, user_id, dist_threshold, time_threshold, gap_threshold, include_last, print_progress, n_jobs
+):
+    """Find the positionfix segments that form staypoints of all users, see _sliding_segments_users_nb().
+
+    The positionfixes have to be sorted by user and time.
+    """
+    # n_jobs follows the joblib convention, i.e., -1 uses all CPUs, -2 all but one, ...
+    if n_jobs == 0:
+        raise ValueError("n_jobs == 0 has no meaning. Use n_jobs=1 to process the users one after the other.")
+    nb_threads = n_jobs if n_jobs > 0 else max(os.cpu_count() + 1 + n_jobs, 1)
+
+    if len(tracked_at) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+
+    # the pfs of a user are the slice between two consecutive user bounds
+    user_bounds = np.concatenate(([0], np.flatnonzero(user_id[1:] != user_id[:-1]) + 1, [len(user_id)]))
+    nb_users = len(user_bounds) - 1
+
+    # the kernel releases the GIL -> batches of users are processed in parallel threads
+    # use more batches than threads if the progress is shown
+    batches = np.array_split(np.arange(nb_users), min(nb_users, 100 if print_progress else nb_threads))
+
+    def process_batch(users):
+        return _sliding_segments_users_nb(
+            lon,
+            lat,
+            tracked_at,
+            user_bounds[users],
+            user_bounds[users + 1],
+            dist_threshold,
+            time_threshold,
+            gap_threshold,
+            include_last,
+        )
+
+    segments = []
+    with ThreadPoolExecutor(max_workers=nb_threads) as executor:
+        results = executor.map(process_batch, batches) if nb_threads > 1 else map(process_batch, batches)
+        with tqdm(total=nb_users, disable=not print_progress) as pbar:
+            for users, result in zip(batches, results):
+                segments.append(result)
+                pbar.update(len(users))
+    return tuple(np.concatenate(positions) for positions in zip(*segments))
+
+
+@njit(cache=True)
+def _sliding_segments_nb(
+    lon, lat, tracked_at, dist_threshold, time_threshold, gap_threshold, include_last, r=6371000.0
+):
+    """Find the positionfix segments that form staypoints of one user with the sliding method.
+
+    Parameters
+    ----------
+    lon, lat : np.ndarray of float
+        Coordinates of the time-sorted positionfixes in radians.
+
+    tracked_at : np.ndarray of int64
+        Tracking times of the positionfixes in nanoseconds.
+
+    dist_threshold : float
+        Distance threshold in meters.
+
+    time_threshold : int
+        Time threshold in nanoseconds.
+
+    gap_threshold : int
+        Maximal temporal gap between consecutive positionfixes in nanoseconds.
+
+    include_last : bool
+        Whether to also return the last (unfinished) staypoint.
+
+    r : float, default 6371000.0
+        Radius of the reference sphere for the haversine distance.
+
+    Returns
+    -------
+    starts, ends : np.ndarray of int64
+        Positions of the first and one after the last positionfix of each staypoint. For all but an included last
+        staypoint, 'ends' also points to the positionfix defining 'finished_at'.
+    """
+    n = len(tracked_at)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    # every staypoint consumes at least one positionfix -> at most n staypoints
+    starts = np.empty(n, dtype=np.int64)
+    ends = np.empty(n, dtype=np.int64)
+    n_sp = 0
+
+    # the distance along the parallel of start and then along the meridian is an upper bound of the haversine
+    # distance, if this bound is below the threshold the exact distance does not need to be computed
+    dist_threshold_rad = dist_threshold / r
 
-    ret_sp = []
     curr = start = 0
-    for curr in range(1, len(df)):
+    # the terms of the haversine distance that only depend on start are computed once per start
+    lat_start, lon_start, cos_lat_start = lat[0], lon[0], math.cos(lat[0])
+    for curr in range(1, n):
         # the gap of two consecutive positionfixes should not be too long
-        if gap_times[curr]:
+        if (tracked_at[curr] - tracked_at[curr - 1]) > gap_threshold:
             start = curr
+            lat_start, lon_start, cos_lat_start = lat[curr], lon[curr], math.cos(lat[curr])
+            continue
+
+        dlat = lat[curr] - lat_start
+        dlon = lon[curr] - lon_start
+        if abs(dlat) + abs(dlon) * cos_lat_start < dist_threshold_rad:
             continue
 
-        delta_dist = dist_func(x[start], y[start], x[curr], y[curr], float_flag=True)
+        cos_lat_curr = math.cos(lat[curr])
+        sin_dlat = math.sin(dlat * 0.5)
+        sin_dlon = math.sin(dlon * 0.5)
+        a = sin_dlat * sin_dlat + cos_lat_start * cos_lat_curr * sin_dlon * sin_dlon
+        delta_dist = 2 * r * math.asin(math.sqrt(min(a, 1.0)))
         if delta_dist >= dist_threshold:
             # we want the staypoint to have long enough duration
-            if (df["tracked_at"].iloc[curr] - df["tracked_at"].iloc[start]) >= time_threshold:
-                ret_sp.append(__create_new_staypoints(start, curr, df, elevation_flag, geo_col))
+            if (tracked_at[curr] - tracked_at[start]) >= time_threshold:
+                starts[n_sp] = start
+                ends[n_sp] = curr
+                n_sp += 1
             # distance large enough but time is too short -> not a staypoint
-            # also initializer when new sp is added
+            # also initializer when new sp is added, the cosine of its latitude is already known
             start = curr
+            lat_start, lon_start, cos_lat_start = lat[curr], lon[curr], cos_lat_curr
 
     if include_last:  # aggregate remaining positionfixes
         # additional control: we aggregate only if duration longer than time_threshold
-        if (df["tracked_at"].iloc[curr] - df["tracked_at"].iloc[start]) >= time_threshold:
-            new_sp = __create_new_staypoints(start, curr, df, elevation_flag, geo_col, last_flag=True)
-            ret_sp.append(new_sp)
-
-    ret_sp = pd.DataFrame(ret_sp)
-    ret_sp["user_id"] = df["user_id"].unique()[0]
-    return ret_sp
+        if (tracked_at[curr] - tracked_at[start]) >= time_threshold:
+            starts[n_sp] = start
+            ends[n_sp] = n
+            n_sp += 1
 
+    return starts[:n_sp], ends[:n_sp]
 
-def __create_new_staypoints(start, end, pfs, elevation_flag, geo_col, last_flag=False):
-    """Create a staypoint with relevant infomation from start to end pfs."""
-    new_sp = {}
 
-    # Here we consider pfs[end] time for stp 'finished_at', but only include
-    # pfs[end - 1] for stp geometry and pfs linkage.
-    new_sp["started_at"] = pfs["tracked_at"].iloc[start]
-    new_sp["finished_at"] = pfs["tracked_at"].iloc[end]
-
-    # if end is the last pfs, we want to include the info from it as well
-    if last_flag:
-        end = len(pfs)
-    points = pfs[geo_col].iloc[start:end].unary_union
-    if check_gdf_planar(pfs):
-        new_sp[geo_col] = points.centroid
-    else:
-        new_sp[geo_col] = angle_centroid_multipoints(points)[0]
+@njit(nogil=True, cache=True)
+def _sliding_segments_users_nb(
+    lon, lat, tracked_at, user_starts, user_ends, dist_threshold, time_threshold, gap_threshold, include_last
+):
+    """Run _sliding_segments_nb for the positionfixes [user_starts[u], user_ends[u]) of every user u.
 
-    if elevation_flag:
-        new_sp["elevation"] = pfs["elevation"].iloc[start:end].median()
-    new_sp["pfs_id"] = pfs.index[start:end].to_list()
+    Returns
+    -------
+    starts, ends : np.ndarray of int64
+        Positions of the first and one after the last positionfix of each staypoint, ordered by user.
 
-    return new_sp
+    finished : np.ndarray of int64
+        Position of the positionfix defining 'finished_at' of each staypoint.
+    """
+    # every staypoint consumes at least one positionfix -> at most as many staypoints as positionfixes
+    nb_pfs = (user_ends - user_starts).sum()
+    starts = np.empty(nb_pfs, dtype=np.int64)
+    ends = np.empty(nb_pfs, dtype=np.int64)
+    finished = np.empty(nb_pfs, dtype=np.int64)
+    n_sp = 0
+    for u in range(len(user_starts)):
+        lo, hi = user_starts[u], user_ends[u]
+        sp_starts, sp_ends = _sliding_segments_nb(
+            lon[lo:hi], lat[lo:hi], tracked_at[lo:hi], dist_threshold, time_threshold, gap_threshold, include_last
+        )
+        nb_sp = len(sp_starts)
+        starts[n_sp : n_sp + nb_sp] = sp_starts + lo
+        ends[n_sp : n_sp + nb_sp] = sp_ends + lo
+        # if end is after the last pfs of the user (include_last), the last pfs defines 'finished_at'
+        finished[n_sp : n_sp + nb_sp] = np.minimum(sp_ends, hi - lo - 1) + lo
+        n_sp += nb_sp
+    return starts[:n_sp], ends[:n_sp], finished[:n_sp]
 
 
 def _drop_invalid_triplegs(tpls, pfs):
@@ -54,7 +54,8 @@ def generate_locations(
         The maximum number of concurrently running jobs. If -1 all CPUs are used. If 1 is given, no parallel
         computing code is used at all, which is useful for debugging. See
         https://joblib.readthedocs.io/en/latest/parallel.html#parallel-reference-documentation
-        for a detailed description
+        for a detailed description. For 'agg_level'='user' the users are processed in parallel, for
+        'agg_level'='dataset' the neighborhood search of 'dbscan' runs in parallel.
 
     Returns
     -------
@@ -82,7 +83,9 @@ def generate_locations(
         eps = epsilon / 6371000 if distance_metric == "haversine" else epsilon
         # scikit haversine_dist wants radian. (We assume that this is good enough)
         # https://scikit-learn.org/stable/modules/generated/sklearn.metrics.pairwise.haversine_distances.html
-        db = DBSCAN(eps=eps, min_samples=num_samples, algorithm="ball_tree", metric=distance_metric)
+        # users are processed in parallel, on the dataset level the neighborhood queries of DBSCAN are parallelized
+        db_n_jobs = n_jobs if agg_level == "dataset" else None
+        db = DBSCAN(eps=eps, min_samples=num_samples, algorithm="ball_tree", metric=distance_metric, n_jobs=db_n_jobs)
 
         if agg_level == "user":
             sp = applyParallel(
@@ -196,9 +199,13 @@ def _gen_locs_dbscan(sp, distance_metric, db):
     sp : GeoDataFrame (as trackintel staypoints)
         Staypoints with new column "location_id"
     """
-    p = np.array([sp.geometry.x, sp.geometry.y]).transpose()
+    x = sp.geometry.x.to_numpy()
+    y = sp.geometry.y.to_numpy()
     if distance_metric == "haversine":
-        p = np.deg2rad(p)  # haversine distance metric assumes input is in rad
+        # haversine distance metric assumes input is in rad and in [lat, lon] order
+        p = np.deg2rad(np.column_stack((y, x)))
+    else:
+        p = np.column_stack((x, y))
     labels = db.fit_predict(p)
     sp["location_id"] = labels
     return sp
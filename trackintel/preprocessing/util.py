@@ -129,16 +129,39 @@ def angle_centroid_multipoints(geometry):
     """
     g = pygeos.from_shapely(geometry)
     g, index = pygeos.get_coordinates(g, return_index=True)
-    # number of coordinate pairs per MultiPoint
-    count = np.bincount(index)
-    x, y = g[:, 0], g[:, 1]
+    x, y = _angle_centroid_coordinates(g, index)
+    # shapely Geometry has no crs information
+    crs = None if isinstance(geometry, BaseGeometry) else geometry.crs
+    return gpd.points_from_xy(x, y, crs=crs)
+
+
+def _angle_centroid_coordinates(coords, index, minlength=0):
+    """Calculate the mean of angles of coordinates per group
+
+    Parameters
+    ----------
+    coords : np.ndarray
+        Array of shape (n, 2) with the x and y coordinates in degrees.
+
+    index : np.ndarray of int
+        Group of each coordinate pair.
+
+    minlength : int, default 0
+        Minimal number of groups, see np.bincount.
+
+    Returns
+    -------
+    x, y : np.ndarray
+        Mean of the x (with wrapping) and y coordinates of each group.
+    """
+    # number of coordinate pairs per group
+    count = np.bincount(index, minlength=minlength)
+    x, y = coords[:, 0], coords[:, 1]
     # calculate mean of y Coordinates -> no wrapping
-    y = np.bincount(index, weights=y) / count
+    y = np.bincount(index, weights=y, minlength=minlength) / count
     # calculate mean of x Coordinates with wrapping
     x_rad = np.deg2rad(x)
-    x_sin = np.bincount(index, weights=np.sin(x_rad)) / count
-    x_cos = np.bincount(index, weights=np.cos(x_rad)) / count
+    x_sin = np.bincount(index, weights=np.sin(x_rad), minlength=minlength) / count
+    x_cos = np.bincount(index, weights=np.cos(x_rad), minlength=minlength) / count
     x = np.rad2deg(np.arctan2(x_sin, x_cos))
-    # shapely Geometry has no crs information
-    crs = None if isinstance(geometry, BaseGeometry) else geometry.crs
-    return gpd.points_from_xy(x, y, crs=crs)
+    return x, y
@@ -72,8 +72,8 @@ def plot_locations(
 
     center_latitude = (ax.get_ylim()[0] + ax.get_ylim()[1]) / 2
     radius = meters_to_decimal_degrees(radius, center_latitude)
-    for pt in locations.to_dict("records"):
-        circle = mpatches.Circle((pt["center"].x, pt["center"].y), radius, facecolor="none", edgecolor="r", zorder=4)
+    for x, y in zip(locations["center"].x.to_numpy(), locations["center"].y.to_numpy()):
+        circle = mpatches.Circle((x, y), radius, facecolor="none", edgecolor="r", zorder=4)
         ax.add_artist(circle)
     ax.set_aspect("equal", adjustable="box")
 
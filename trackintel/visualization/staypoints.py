@@ -61,10 +61,8 @@ def plot_staypoints(staypoints, out_filename=None, radius=100, positionfixes=Non
 
     center_latitude = (ax.get_ylim()[0] + ax.get_ylim()[1]) / 2
     radius = meters_to_decimal_degrees(radius, center_latitude)
-    for pt in staypoints.to_dict("records"):
-        circle = mpatches.Circle(
-            (pt[name_geocol].x, pt[name_geocol].y), radius, facecolor="none", edgecolor="g", zorder=3
-        )
+    for x, y in zip(staypoints[name_geocol].x.to_numpy(), staypoints[name_geocol].y.to_numpy()):
+        circle = mpatches.Circle((x, y), radius, facecolor="none", edgecolor="g", zorder=3)
         ax.add_artist(circle)
 
     ax.set_aspect("equal", adjustable="box")